@@ -1,19 +1,25 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
+import asyncio
+import logging
 import os
-import uuid
-import json
+import threading
+import orjson
+from functools import lru_cache
 from datetime import datetime
 from typing import Optional, Dict
 import shutil
 from pathlib import Path
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+from xml.sax.saxutils import escape
+from PIL import Image, UnidentifiedImageError
 import re
 import csv
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -24,13 +30,83 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create necessary directories
+# The XMP document has a fixed shape - only the UUID, preset name and the
+# crs:* values change per request, so fill a prebuilt template instead of
+# building and serializing a DOM every time.
+XMP_TEMPLATE = """<?xml version='1.0' encoding='utf-8'?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/" xmlns:dc="http://purl.org/dc/elements/1.1/" x:xmptk="Adobe XMP Core 5.6-c140 79.160451, 2017/05/06-01:08:21">
+  <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns:crs="http://ns.adobe.com/camera-raw-settings/1.0/">
+    <rdf:Description rdf:about="" crs:PresetType="Normal" crs:Cluster="" crs:UUID="{uuid}" crs:SupportsAmount="False" crs:RequiresRGBTables="False" crs:Group="User Presets" crs:Name="Preset_{name}" crs:Version="13.0" crs:ProcessVersion="11.0" crs:Exposure2012="{exposure}" crs:Contrast2012="{contrast}" crs:Highlights2012="{highlights}" crs:Shadows2012="{shadows}" crs:Whites2012="{whites}" crs:Blacks2012="{blacks}" crs:Clarity2012="{clarity}" crs:Vibrance="{vibrance}" crs:Saturation="{saturation}" crs:Temperature="{temperature}" crs:Tint="{tint}"{hue_attrs}/>
+  </rdf:RDF>
+</x:xmpmeta>
+"""
+
+# Create necessary directories; DATA_DIR holds internal state and is
+# deliberately not mounted anywhere public
 UPLOAD_DIR = Path("uploads")
 PRESET_DIR = Path("presets")
 CONFIG_DIR = Path("config")
+DATA_DIR = Path("data")
 UPLOAD_DIR.mkdir(exist_ok=True)
 PRESET_DIR.mkdir(exist_ok=True)
 CONFIG_DIR.mkdir(exist_ok=True)
+DATA_DIR.mkdir(exist_ok=True)
+
+# Serve stored files directly - StaticFiles streams via the threadpool and
+# sendfile where available, without a Python handler per GET
+app.mount("/presets", StaticFiles(directory=PRESET_DIR), name="presets")
+app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+
+# Upload metadata lives in memory and is replayed from an append-only JSONL
+# log at startup, so listing is a dict read and each upload/delete appends
+# one line instead of rewriting a metadata file
+METADATA_LOG_PATH = DATA_DIR / "metadata.jsonl"
+
+# One-time migration from the old location inside the public uploads dir
+_legacy_log = UPLOAD_DIR / "metadata.jsonl"
+if _legacy_log.exists() and not METADATA_LOG_PATH.exists():
+    _legacy_log.rename(METADATA_LOG_PATH)
+
+METADATA: Dict[str, dict] = {}
+_metadata_log = open(METADATA_LOG_PATH, "ab", buffering=0)
+# Each gunicorn worker holds its own copy of the index but all of them
+# append to the same log, so reads first replay whatever other workers
+# wrote since the last look; the reader handle keeps consuming from
+# where it stopped, so a sync costs one short read at the log's tail
+_metadata_reader = open(METADATA_LOG_PATH, "rb")
+_metadata_lock = threading.Lock()
+
+def sync_metadata() -> None:
+    """Apply log lines appended since the last call (by any worker)."""
+    with _metadata_lock:
+        while True:
+            line = _metadata_reader.readline()
+            if not line:
+                break
+            if not line.endswith(b"\n"):
+                # another worker is mid-append; rewind, retry next sync
+                _metadata_reader.seek(-len(line), os.SEEK_CUR)
+                break
+            line = line.strip()
+            if not line:
+                continue
+            entry = orjson.loads(line)
+            if "_deleted" in entry:
+                METADATA.pop(entry["_deleted"], None)
+            else:
+                METADATA[entry["filename"]] = entry
+
+sync_metadata()
+
+def record_upload(entry: dict) -> None:
+    METADATA[entry["filename"]] = entry
+    _metadata_log.write(orjson.dumps(entry) + b"\n")
+
+def record_delete(filename: str) -> None:
+    # Unconditional: the upload may have been recorded by another worker,
+    # so absence from this index must still leave a tombstone in the log
+    METADATA.pop(filename, None)
+    _metadata_log.write(orjson.dumps({"_deleted": filename}) + b"\n")
 
 # Default preset values if CSV is not available
 DEFAULT_PRESETS = {
@@ -61,12 +137,30 @@ DEFAULT_PRESETS = {
     # ... other default presets ...
 }
 
+# CSV parse cache - the file changes rarely, so re-parsing it per request
+# was pure waste; the stat-based check keeps manual edits working
+_presets_cache: Optional[Dict[str, dict]] = None
+_presets_mtime: float = 0.0
+
 def load_preset_configs() -> Dict[str, dict]:
-    """Load preset configurations from CSV file."""
+    """Load preset configurations from CSV file, cached by file mtime."""
+    global _presets_cache, _presets_mtime
+
     config_path = CONFIG_DIR / "presets.csv"
-    if not config_path.exists():
+    try:
+        mtime = config_path.stat().st_mtime
+    except OSError:
         return DEFAULT_PRESETS
 
+    if _presets_cache is None or mtime != _presets_mtime:
+        _presets_cache = _parse_preset_csv(config_path)
+        _presets_mtime = mtime
+        # merged per-style results embed these values, so drop them too
+        _preset_for_style.cache_clear()
+        _render_xmp_body.cache_clear()
+    return _presets_cache
+
+def _parse_preset_csv(config_path: Path) -> Dict[str, dict]:
     presets = {}
     try:
         with open(config_path, 'r') as f:
@@ -110,133 +204,253 @@ def load_preset_configs() -> Dict[str, dict]:
                 }
         return presets
     except Exception as e:
-        print(f"Error loading preset configs: {e}")
+        logger.error("Error loading preset configs: %s", e)
         return DEFAULT_PRESETS
 
-def generate_xmp_preset(style_description: str) -> dict:
-    """Generate Lightroom preset values based on style description."""
-    # Load preset configurations
-    presets = load_preset_configs()
-    
-    # Base preset values
-    preset = {
-        "Basic": {
-            "Exposure": 0.0,
-            "Contrast": 0,
-            "Highlights": 0,
-            "Shadows": 0,
-            "Whites": 0,
-            "Blacks": 0,
-            "Clarity": 0,
-            "Vibrance": 0,
-            "Saturation": 0,
-            "Temperature": 0,
-            "Tint": 0
-        },
-        "ToneCurve": {
-            "Enabled": True,
-            "Points": [[0, 0], [255, 255]]
-        },
-        "SplitToning": {
-            "Enabled": True,
-            "HighlightHue": 0,
-            "HighlightSaturation": 0,
-            "ShadowHue": 0,
-            "ShadowSaturation": 0,
-            "Balance": 0
-        }
+# Neutral base values merged under whichever preset matches
+BASE_PRESET = {
+    "Basic": {
+        "Exposure": 0.0,
+        "Contrast": 0,
+        "Highlights": 0,
+        "Shadows": 0,
+        "Whites": 0,
+        "Blacks": 0,
+        "Clarity": 0,
+        "Vibrance": 0,
+        "Saturation": 0,
+        "Temperature": 0,
+        "Tint": 0
+    },
+    "ToneCurve": {
+        "Enabled": True,
+        "Points": [[0, 0], [255, 255]]
+    },
+    "SplitToning": {
+        "Enabled": True,
+        "HighlightHue": 0,
+        "HighlightSaturation": 0,
+        "ShadowHue": 0,
+        "ShadowSaturation": 0,
+        "Balance": 0
     }
+}
 
-    # Find the best matching preset
-    style_lower = style_description.lower()
-    best_match = None
-    best_score = 0
+class _IdPool:
+    """Carve 16-byte preset ids out of batched urandom reads.
 
-    for preset_name in presets:
-        if preset_name in style_lower:
-            best_match = preset_name
-            break
+    Reading entropy per request costs a syscall each time; one batched
+    read amortizes it across 256 ids. Each worker process holds its own
+    pool, and the lock keeps threadpool callers from splitting a token.
+    """
+
+    def __init__(self, batch: int = 256):
+        self._batch = batch
+        self._buf = b""
+        self._lock = threading.Lock()
+
+    def next_hex(self) -> str:
+        with self._lock:
+            if len(self._buf) < 16:
+                self._buf = os.urandom(16 * self._batch)
+            token, self._buf = self._buf[:16], self._buf[16:]
+        return token.hex()
+
+_id_pool = _IdPool()
+
+def _copy_preset(preset: dict) -> dict:
+    """Copy a preset dict without the full deepcopy machinery.
+
+    Presets are two levels of dicts plus the ToneCurve point list, so a
+    structured copy is deep enough to keep cached templates pristine while
+    skipping deepcopy's per-object dispatch.
+    """
+    out = {}
+    for section, values in preset.items():
+        if isinstance(values, dict):
+            copied = dict(values)
+            if "Points" in copied:
+                copied["Points"] = [list(p) for p in copied["Points"]]
+            out[section] = copied
+        else:
+            out[section] = values
+    return out
+
+@lru_cache(maxsize=4)
+def _preset_name_pattern(names: tuple) -> "re.Pattern":
+    """Compile one alternation over all preset names, longest first.
+
+    A single DFA pass over the style string replaces one substring scan
+    per preset; longest-first ordering keeps the most specific name
+    winning when one is a prefix of another.
+    """
+    alternation = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+    return re.compile(alternation)
+
+@lru_cache(maxsize=256)
+def _preset_for_style(style_lower: str) -> dict:
+    """Resolve a lowercased style description to its merged preset values."""
+    presets = load_preset_configs()
+
+    preset = _copy_preset(BASE_PRESET)
+
+    # Find the best matching preset in one scan
+    best_match = None
+    if presets:
+        match = _preset_name_pattern(tuple(presets)).search(style_lower)
+        if match:
+            best_match = match.group(0)
 
     if best_match:
         # Apply the matching preset
-        preset["Basic"].update(presets[best_match]["Basic"])
-        preset["ToneCurve"] = presets[best_match]["ToneCurve"]
-        preset["SplitToning"] = presets[best_match]["SplitToning"]
+        matched = presets[best_match]
+        preset["Basic"].update(matched["Basic"])
+        preset["ToneCurve"] = matched["ToneCurve"]
+        preset["SplitToning"] = matched["SplitToning"]
+        if "ColorAdjustments" in matched:
+            preset["ColorAdjustments"] = matched["ColorAdjustments"]
 
     return preset
 
-def slugify(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9]+', '-', text)
-    return text.strip('-')
-
-def create_xmp_file(preset_data: dict, xmp_filename: str) -> str:
-    # Create the root element with dc namespace
-    root = ET.Element("x:xmpmeta", {
-        "xmlns:x": "adobe:ns:meta/",
-        "x:xmptk": "Adobe XMP Core 5.6-c140 79.160451, 2017/05/06-01:08:21",
-        "xmlns:dc": "http://purl.org/dc/elements/1.1/"
-    })
-    
-    # Create the RDF element
-    rdf = ET.SubElement(root, "rdf:RDF", {
-        "xmlns:rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
-        "xmlns:crs": "http://ns.adobe.com/camera-raw-settings/1.0/"
-    })
-    
-    # Create the Description element with Lightroom expected tags
-    desc = ET.SubElement(rdf, "rdf:Description", {
-        "rdf:about": "",
-        "crs:PresetType": "Normal",
-        "crs:Cluster": "",
-        "crs:UUID": str(uuid.uuid4()),
-        "crs:SupportsAmount": "False",
-        "crs:RequiresRGBTables": "False",
-        "crs:Group": "User Presets",
-        "crs:Name": f"Preset_{xmp_filename}",
-        "crs:Version": "13.0",
-        "crs:ProcessVersion": "11.0"
-    })
-
-    # Map to Lightroom's expected tags
+@lru_cache(maxsize=64)
+def _render_xmp_body(style_lower: str) -> str:
+    """Render the XMP for a style, leaving uuid/name as placeholders.
+
+    The body depends only on the matched preset, so per request all that
+    remains is substituting the id and escaped filename.
+    """
+    preset_data = _preset_for_style(style_lower)
     basic = preset_data["Basic"]
-    desc.set("crs:Exposure2012", str(basic["Exposure"]))
-    desc.set("crs:Contrast2012", str(basic["Contrast"]))
-    desc.set("crs:Highlights2012", str(basic["Highlights"]))
-    desc.set("crs:Shadows2012", str(basic["Shadows"]))
-    desc.set("crs:Whites2012", str(basic.get("Whites", 0)))
-    desc.set("crs:Blacks2012", str(basic.get("Blacks", 0)))
-    desc.set("crs:Clarity2012", str(basic["Clarity"]))
-    desc.set("crs:Vibrance", str(basic["Vibrance"]))
-    desc.set("crs:Saturation", str(basic["Saturation"]))
-    desc.set("crs:Temperature", str(basic["Temperature"]))
-    desc.set("crs:Tint", str(basic["Tint"]))
-
-    # Add color adjustments if present
-    if "ColorAdjustments" in preset_data and preset_data["ColorAdjustments"]["Enabled"]:
-        color_adjustments = preset_data["ColorAdjustments"]["Adjustments"]
-        if color_adjustments != "None":
-            # Parse color adjustments string and set HSL values
-            adjustments = color_adjustments.split(", ")
-            for adjustment in adjustments:
-                if ":" in adjustment:
-                    color, value = adjustment.split(":")
-                    if color == "All":
-                        # Apply to all colors
-                        for c in ["Red", "Orange", "Yellow", "Green", "Aqua", "Blue", "Purple", "Magenta"]:
-                            desc.set(f"crs:Hue{c}", value)
-                    else:
-                        # Apply to specific color
-                        desc.set(f"crs:Hue{color}", value)
-
-    # Debug print the XML string
-    xml_str = minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
-    print("\n--- XMP XML DEBUG ---\n", xml_str, "\n--- END XMP XML DEBUG ---\n")
-    
-    # Save the XMP file
+    return XMP_TEMPLATE.format(
+        uuid="{uuid}",
+        name="{name}",
+        exposure=basic["Exposure"],
+        contrast=basic["Contrast"],
+        highlights=basic["Highlights"],
+        shadows=basic["Shadows"],
+        whites=basic.get("Whites", 0),
+        blacks=basic.get("Blacks", 0),
+        clarity=basic["Clarity"],
+        vibrance=basic["Vibrance"],
+        saturation=basic["Saturation"],
+        temperature=basic["Temperature"],
+        tint=basic["Tint"],
+        hue_attrs=build_hue_attributes(preset_data),
+    )
+
+_SLUG_RE = re.compile(r'[^a-z0-9]+')
+
+def slugify(text: str) -> str:
+    return _SLUG_RE.sub('-', text.lower()).strip('-')
+
+def build_hue_attributes(preset_data: dict) -> str:
+    """Render the optional crs:Hue* attributes for the XMP template."""
+    if "ColorAdjustments" not in preset_data or not preset_data["ColorAdjustments"]["Enabled"]:
+        return ""
+
+    color_adjustments = preset_data["ColorAdjustments"]["Adjustments"]
+    if color_adjustments == "None":
+        return ""
+
+    # Parse color adjustments string into HSL attributes
+    attrs = []
+    for adjustment in color_adjustments.split(", "):
+        if ":" in adjustment:
+            color, value = adjustment.split(":")
+            value = escape(value, {'"': "&quot;"})
+            if color == "All":
+                # Apply to all colors
+                for c in ["Red", "Orange", "Yellow", "Green", "Aqua", "Blue", "Purple", "Magenta"]:
+                    attrs.append(f' crs:Hue{c}="{value}"')
+            else:
+                # Apply to specific color
+                attrs.append(f' crs:Hue{color}="{value}"')
+    # The rendered body is .format()ed a second time to fill uuid/name,
+    # so literal braces from the CSV must be doubled to survive it
+    return "".join(attrs).replace("{", "{{").replace("}", "}}")
+
+def _sendfile_copy(src_fd: int, dst_fd: int) -> None:
+    """Copy a whole file kernel-side with sendfile(2)."""
+    size = os.fstat(src_fd).st_size
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+def save_upload(src, file_path: Path) -> None:
+    """Persist an uploaded file object to disk (blocking; run in a thread)."""
+    with open(file_path, "wb", buffering=0) as buffer:
+        # Uploads past Starlette's spool threshold are already a real temp
+        # file - sendfile copies those without bouncing bytes through Python
+        if getattr(src, "_rolled", False) and hasattr(os, "sendfile"):
+            try:
+                _sendfile_copy(src.fileno(), buffer.fileno())
+                return
+            except OSError:
+                # e.g. EINVAL on filesystems without sendfile support
+                buffer.seek(0)
+                buffer.truncate()
+                src.seek(0)
+        # A 1 MiB buffer keeps the syscall count low for multi-MB photos
+        shutil.copyfileobj(src, buffer, length=1024 * 1024)
+
+# Previews are display-only; the XMP still applies to the full-res original
+PREVIEW_MAX_SIZE = (2048, 2048)
+
+def generate_preview(file_path: Path, preview_path: Path) -> None:
+    """Write a downscaled preview of an upload (blocking; run in a thread)."""
+    with Image.open(file_path) as img:
+        # Image.open is lazy, so checking format/size costs no decode
+        if (img.format == "JPEG"
+                and img.width <= PREVIEW_MAX_SIZE[0]
+                and img.height <= PREVIEW_MAX_SIZE[1]):
+            needs_encode = False
+        else:
+            needs_encode = True
+            # For JPEGs, draft() has libjpeg decode straight to a 1/2..1/8
+            # DCT scale, so the full-res image is never materialized
+            img.draft("RGB", PREVIEW_MAX_SIZE)
+            img.thumbnail(PREVIEW_MAX_SIZE, Image.LANCZOS)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            img.save(preview_path, "JPEG", quality=85)
+    if not needs_encode:
+        # Already a small JPEG - re-encoding would burn a libjpeg
+        # decode+encode round-trip just to degrade quality
+        try:
+            os.link(file_path, preview_path)
+        except OSError:
+            shutil.copyfile(file_path, preview_path)
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write a small file in one syscall and publish it with a rename."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
+async def create_xmp_file(style_lower: str, xmp_filename: str, preset_id: str) -> str:
+    # One stat per request: a CSV mtime change must clear the style caches
+    # *before* they are consulted, or cached styles would serve stale values
+    load_preset_configs()
+
+    # Cached body per style; the filename is user-derived, so escape it
+    xml_str = _render_xmp_body(style_lower).format(
+        uuid=preset_id,
+        name=escape(xmp_filename, {'"': "&quot;"}),
+    )
+    # Lazy %s formatting - the message is only built when debug is enabled
+    logger.debug("XMP generated for %s:\n%s", xmp_filename, xml_str)
+
+    # Save the XMP file off the loop; one write syscall plus an atomic
+    # rename, so a download can never observe a half-written preset
     xmp_path = PRESET_DIR / xmp_filename
-    with open(xmp_path, "w") as f:
-        f.write(xml_str)
+    await asyncio.to_thread(_atomic_write, xmp_path, xml_str.encode("utf-8"))
     return str(xmp_path)
 
 @app.post("/generate_preset/")
@@ -245,63 +459,93 @@ async def generate_preset(
     style_description: str = Form(...)
 ):
     try:
-        # Generate a unique ID for this preset
-        preset_id = str(uuid.uuid4())
+        # Generate a unique ID for this preset; the same id doubles as the
+        # XMP's crs:UUID
+        preset_id = _id_pool.next_hex()
         
-        # Save the uploaded file
         file_path = UPLOAD_DIR / f"{preset_id}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Generate preset values
-        preset_data = generate_xmp_preset(style_description)
-        
+        preview_filename = f"preview_{preset_id}.jpg"
+        preview_path = UPLOAD_DIR / preview_filename
+
+        # Normalize the style once - the slug, the preset lookup and the
+        # body cache all key off the lowercased form
+        style_lower = style_description.lower()
+
         # Prepare XMP file name
         original_name = os.path.splitext(file.filename)[0]
-        preset_slug = slugify(style_description)
+        preset_slug = slugify(style_lower)
         xmp_filename = f"{original_name}-preset-{preset_slug}.xmp"
-        
-        # Create XMP file
-        xmp_path = create_xmp_file(preset_data, xmp_filename)
-        
+
+        async def persist_upload():
+            # Save off the event loop - the copy blocks for the duration
+            # of a multi-MB disk write - then downscale for the preview,
+            # which needs the saved file
+            await asyncio.to_thread(save_upload, file.file, file_path)
+            await asyncio.to_thread(generate_preview, file_path, preview_path)
+
+        # The XMP write is independent of the upload, so it hides entirely
+        # under the larger copy
+        xmp_task = asyncio.ensure_future(
+            create_xmp_file(style_lower, xmp_filename, preset_id)
+        )
+        try:
+            await asyncio.gather(xmp_task, persist_upload())
+        except UnidentifiedImageError:
+            # Not an image. gather() does not cancel siblings, so let the
+            # XMP write settle, then remove everything this request wrote -
+            # none of it is recorded, so it would otherwise sit on disk
+            # invisible to /files/
+            await asyncio.wait({xmp_task})
+            xmp_task.exception()
+            for partial in (file_path, preview_path, PRESET_DIR / xmp_filename):
+                partial.unlink(missing_ok=True)
+            raise HTTPException(
+                status_code=400, detail="Uploaded file is not a valid image"
+            )
+
+
+        record_upload({
+            "filename": file_path.name,
+            "style_description": style_description,
+            "upload_time": datetime.now().isoformat()
+        })
+
         return {
             "preset_id": preset_id,
             "style_description": style_description,
             "xmp_url": f"/presets/{xmp_filename}",
-            "preview_url": f"/uploads/{preset_id}_{file.filename}"
+            "preview_url": f"/uploads/{preview_filename}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/presets/{filename}")
-async def get_preset(filename: str):
-    preset_path = PRESET_DIR / filename
-    if not preset_path.exists():
-        raise HTTPException(status_code=404, detail="Preset not found")
-    return FileResponse(preset_path)
-
-@app.get("/uploads/{filename}")
-async def get_upload(filename: str):
-    upload_path = UPLOAD_DIR / filename
-    if not upload_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(upload_path)
-
 @app.get("/files/")
 async def list_files():
-    files = []
-    for file in UPLOAD_DIR.glob("*.jpg"):
-        files.append({
-            "filename": file.name,
-            "style_description": "Generated preset",  # In a real app, store this in a database
-            "upload_time": datetime.fromtimestamp(file.stat().st_mtime).isoformat()
-        })
-    return {"files": files}
+    # replay anything other workers logged, then read the local index -
+    # still no directory scan, no per-file stats
+    sync_metadata()
+    return {"files": list(METADATA.values())}
+
+# Stored names are hex ids plus an arbitrary client basename, so reject
+# only what could escape the uploads dir: path separators, a leading dot,
+# NULs - anything else the upload path stored, the delete path must accept
+_SAFE_NAME = re.compile(r'^(?!\.)[^/\\\x00]{1,255}$')
 
 @app.delete("/files/{filename}")
 async def delete_file(filename: str):
-    file_path = UPLOAD_DIR / filename
-    if not file_path.exists():
+    if not _SAFE_NAME.match(filename):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    try:
+        # unlink directly - one syscall instead of exists() + unlink
+        (UPLOAD_DIR / filename).unlink()
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
-    file_path.unlink()
+    if not filename.startswith("preview_"):
+        # Uploads are stored as <id>_<original name>; drop the derived
+        # preview alongside so it cannot be orphaned
+        preset_id = filename.partition("_")[0]
+        (UPLOAD_DIR / f"preview_{preset_id}.jpg").unlink(missing_ok=True)
+    record_delete(filename)
     return {"message": "File deleted successfully"}